@@ -1,43 +1,351 @@
+import copy
+import random
+import socket
+import sys
+import threading
 import time
-from kubernetes import client, config
+from kubernetes import client, config, watch
 from kubernetes.client import configuration 
 from kubernetes.client.rest import ApiException
+from urllib3 import Retry
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import HTTPError, MaxRetryError, ProtocolError
 import functools
+from functools import cached_property
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from common import log_orig as contrail_logging
-from tcutils.util import get_random_name, retry
+from tcutils.util import get_random_name, get_os_env
 from kubernetes.stream import stream
-from pprint import pprint
+
+# Only these are worth another attempt, a 404 or 409 will not go away by
+# retrying. status 0 is what the client raises when no http response was
+# received at all (ssl/websocket errors)
+RETRIABLE_STATUS = (0, 429, 500, 502, 503, 504)
+RETRIABLE_EXCEPTIONS = (ApiException, ProtocolError, MaxRetryError)
+# (connect, read) timeout in seconds of each api call, without it a hung
+# apiserver blocks the test forever
+REQUEST_TIMEOUT = (5, 30)
+# Parsed kube configs and the ApiClient (and so the connection pool) built
+# from them, shared by all the Client objects of a cluster
+_CFG_CACHE = {}
+_API_CLIENT_CACHE = {}
+# and the node cache of each cluster, see _NodeCache
+_NODE_CACHES = {}
+# TCP keepalive on the pooled apiserver connections, so that they are kept
+# (and dead ones detected) across bursts of calls instead of doing a new
+# tls handshake. TCP_KEEP* are not available on all platforms
+KEEPALIVE_SOCKET_OPTIONS = HTTPConnection.default_socket_options + [
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)] + [
+    (socket.IPPROTO_TCP, getattr(socket, opt), value)
+    for opt, value in (('TCP_KEEPIDLE', 30), ('TCP_KEEPINTVL', 10),
+                       ('TCP_KEEPCNT', 3))
+    if hasattr(socket, opt)]
+# the default delete options, the client only serializes the body so
+# one instance can be shared by all calls
+_EMPTY_DELETE_OPTS = client.V1DeleteOptions()
+# runs the optional apiserver liveness check, see Client.init_clients
+_PROBE_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+# server side timeout of the node cache watch, it is resumed right after
+NODE_WATCH_TIMEOUT = 300
+# ask the apiserver for the metadata of the objects only, falling back to
+# the full objects on servers which do not support it
+METADATA_LIST_ACCEPT = ('application/json;as=PartialObjectMetadataList;'
+                        'g=meta.k8s.io;v=v1, application/json')
+METADATA_WATCH_ACCEPT = ('application/json;as=PartialObjectMetadata;'
+                         'g=meta.k8s.io;v=v1, application/json')
+
+
+class TransientK8sError(Exception):
+    '''The api call failed with an error which may go away on its own,
+    the ApiException is the __cause__
+    '''
+
+
+class PermanentK8sError(Exception):
+    '''The api call failed with an error which retrying will not fix,
+    the ApiException is the __cause__
+    '''
+
+
+def _k8s_error(exc):
+    '''Returns the TransientK8sError or PermanentK8sError of the
+    ApiException exc, of the sync or the asyncio client
+    '''
+    if exc.status in RETRIABLE_STATUS:
+        return TransientK8sError(exc)
+    return PermanentK8sError(exc)
+
+
+def _is_retriable(exc):
+    if isinstance(exc, ApiException):
+        return (exc.status in RETRIABLE_STATUS or
+                isinstance(exc.reason, (ProtocolError, MaxRetryError)))
+    return isinstance(exc, (ProtocolError, MaxRetryError))
+
+
+def _extend_read_timeout(timeout, seconds=None):
+    '''Returns the _request_timeout timeout, a (connect, read) tuple or a
+    total in seconds, with seconds more to read. By default its read
+    timeout once more, i.e. doubled
+    '''
+    if timeout is None:
+        return None
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return (connect, read + (read if seconds is None else seconds))
+    return timeout + (timeout if seconds is None else seconds)
+
+
+def _get_backoff_delay(attempt, base=1.0, cap=30, jitter=0.5):
+    '''Exponential backoff capped at cap seconds, plus upto jitter*100 %
+    so that parallel clients do not retry in lock step
+    '''
+    return min(cap, base * 2 ** attempt) * (1 + random.uniform(0, jitter))
+
+
+def _call_with_retries(call, logger, tries, base=1.0, cap=30, jitter=0.5,
+                       reconnect=None):
+    '''Returns call(), calling it upto tries times in all as long as it
+    raises a retriable error, with exponential backoff in between. Any
+    other error is raised right away. reconnect, if given, is called
+    before the last try
+    '''
+    for attempt in range(tries - 1):
+        try:
+            return call()
+        except RETRIABLE_EXCEPTIONS as e:
+            if not _is_retriable(e):
+                raise
+            delay = _get_backoff_delay(attempt, base, cap, jitter)
+            logger.warning("ApiException is caught %s. Retrying in %.1fs...",
+                           e, delay)
+            time.sleep(delay)
+    if reconnect and tries > 1:
+        reconnect()
+    return call()
 
 
 def retry_on_api_exception(*args, **kwargs):
-    """A decorator to retry when kubernetes raises ApiException with ConnectionError."""
+    """A decorator to retry with exponential backoff when kubernetes raises
+    a retriable ApiException (5xx, 429) or a connection error.
+    Any other ApiException is re-raised right away.
+    The number of tries and the backoff are read from the retries,
+    retry_base and retry_cap attributes of the object at call time; the
+    decorator kwargs are only the fallback. The last try is made on new
+    connections, see Client.init_clients"""
     def decorator(f):
-        tries = kwargs.get('tries', 5)
-        delay = kwargs.get('delay', 5)
         @functools.wraps(f)
         def wrapper(cls_obj, *func_args, **func_kwargs):
-            for i in range(tries):
-                try:
-                    return f(cls_obj, *func_args, **func_kwargs)
-                except ApiException as e:
-                    cls_obj.logger.warning("ApiException is caught %s. Retrying..." % e)
-                # retry
-                time.sleep(delay)
-            cls_obj.init_clients()
-            return f(cls_obj, *func_args, **func_kwargs)
+            return _call_with_retries(
+                lambda: f(cls_obj, *func_args, **func_kwargs), cls_obj.logger,
+                getattr(cls_obj, 'retries', kwargs.get('tries', 5)),
+                getattr(cls_obj, 'retry_base', kwargs.get('base', 1.0)),
+                getattr(cls_obj, 'retry_cap', kwargs.get('cap', 30)),
+                kwargs.get('jitter', 0.5), reconnect=cls_obj.init_clients)
         return wrapper
     return decorator
 
 
+def _is_newer(obj, than):
+    '''Whether obj is a later version of the same object than than.
+    Resource versions are opaque, only the numeric ones the apiserver gives
+    are compared, any other is taken as newer
+    '''
+    try:
+        return (int(obj.metadata.resource_version) >
+                int(than.metadata.resource_version))
+    except (TypeError, ValueError):
+        return True
+
+
+class _NodeCache(object):
+    '''The nodes of a cluster by name, listed on first use and then kept up
+    to date by a background watch instead of listing them every time.
+    There is one per cluster, shared by its Client objects. It is built
+    with the retries and request_timeout of the Client which first uses
+    it, which then hold for all of them.
+    Only the metadata of the nodes is fetched and kept, as V1Node objects
+    with just .metadata set
+    '''
+    def __init__(self, v1_h, logger, retries=5, retry_base=1.0, retry_cap=30,
+                 request_timeout=REQUEST_TIMEOUT):
+        self.v1_h = v1_h
+        self.logger = logger
+        self.request_timeout = request_timeout
+        self.retries = retries
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self._nodes = {}
+        # _lock guards _nodes, _start_lock the start and stop of the watch
+        # thread. The watch thread never waits for _start_lock while it
+        # lists the nodes, nor does it hold _lock
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._stop = None
+        self._watcher = None
+
+    def get(self):
+        '''Returns a snapshot list of the nodes
+        '''
+        with self._start_lock:
+            if self._thread is None:
+                resource_version = self._relist()
+                self._stop = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._run, args=(resource_version, self._stop),
+                    name='k8s-node-watch', daemon=True)
+                self._thread.start()
+        with self._lock:
+            return list(self._nodes.values())
+
+    def update(self, event_type, node):
+        '''Apply a watch event, or the node returned by a patch. A node
+        older than the cached one, like a late patch response after the
+        watch got a newer state, is ignored
+        '''
+        node = client.V1Node(metadata=node.metadata)
+        with self._lock:
+            if event_type == 'DELETED':
+                self._nodes.pop(node.metadata.name, None)
+                return
+            cached = self._nodes.get(node.metadata.name)
+            if cached is None or _is_newer(node, cached):
+                self._nodes[node.metadata.name] = node
+
+    def close(self):
+        '''Stop the watch, a later get() lists the nodes and starts it again
+        '''
+        with self._start_lock:
+            if self._thread is None:
+                return
+            self._stop.set()
+            if self._watcher:
+                self._watcher.stop()
+            self._thread = None
+
+    def _relist(self):
+        '''Refill the cache, returns the resource version to watch from
+        '''
+        # served from the watch cache of the apiserver rather than etcd,
+        # it may be slightly stale but the watch catches up from it
+        nodes = _call_with_retries(
+            lambda: self._list_node_metadata(
+                resource_version='0', resource_version_match='NotOlderThan',
+                _request_timeout=_extend_read_timeout(self.request_timeout)),
+            self.logger, self.retries, self.retry_base, self.retry_cap)
+        nodes_by_name = dict((node.metadata.name, node)
+                             for node in nodes.items)
+        with self._lock:
+            self._nodes = nodes_by_name
+        return nodes.metadata.resource_version
+
+    def _list_node_metadata(self, watch=False, _preload_content=True,
+                            _request_timeout=None, **kwargs):
+        '''list_node, or its watch, for the metadata of the nodes only.
+        Takes the resource_version, resource_version_match and
+        timeout_seconds kwargs of list_node. The cache needs every node, so
+        there is no label_selector
+        '''
+        query_params = [(param, kwargs[arg]) for arg, param in (
+            ('resource_version', 'resourceVersion'),
+            ('resource_version_match', 'resourceVersionMatch'),
+            ('timeout_seconds', 'timeoutSeconds')) if arg in kwargs]
+        if watch:
+            query_params.append(('watch', True))
+        accept = METADATA_WATCH_ACCEPT if watch else METADATA_LIST_ACCEPT
+        return self.v1_h.api_client.call_api(
+            '/api/v1/nodes', 'GET', query_params=query_params,
+            header_params={'Accept': accept}, response_type='V1NodeList',
+            auth_settings=['BearerToken'], _return_http_data_only=True,
+            _preload_content=_preload_content,
+            _request_timeout=_request_timeout)
+
+    def _run(self, resource_version, stop):
+        '''Apply the node watch events to the cache till stop is set
+        '''
+        while not stop.is_set():
+            try:
+                if resource_version is None:
+                    resource_version = self._relist()
+                self._watcher = watcher = watch.Watch(return_type='V1Node')
+                for event in watcher.stream(
+                        self._list_node_metadata,
+                        resource_version=resource_version,
+                        timeout_seconds=NODE_WATCH_TIMEOUT,
+                        # a quiet watch sends nothing till the server
+                        # side timeout, only give up on it after that
+                        _request_timeout=_extend_read_timeout(
+                            self.request_timeout, NODE_WATCH_TIMEOUT)):
+                    if stop.is_set():
+                        return
+                    self.update(event['type'], event['object'])
+                # the server ended the watch, resume from the last event
+                resource_version = watcher.resource_version
+            except (ApiException, HTTPError) as e:
+                # 410 Gone: the resource version is too old to watch from.
+                # Either way the events in between are lost, start over
+                # from a new list
+                if getattr(e, 'status', None) != 410:
+                    self.logger.warning('Node watch failed: %s', e)
+                    stop.wait(_get_backoff_delay(0, self.retry_base,
+                                                 self.retry_cap))
+                resource_version = None
+            except Exception:
+                # a bug, not a cluster problem. Do not loop on it, leave it
+                # to the next get() to start over
+                self.logger.exception('Node watch stopped')
+                with self._start_lock:
+                    if self._stop is stop:
+                        self._thread = None
+                return
+    # end _run
+
+
 class Client(object):
+    # the cached_property api handles, built from self.api_client
+    _API_HANDLES = ('res_v1_obj_h', 'v1_h', 'v1_networking', 'apps_v1_h')
 
-    def __init__(self, config_file='/etc/kubernetes/admin.conf', logger=None, cluster=None):
+    def __init__(self, config_file='/etc/kubernetes/admin.conf', logger=None, cluster=None,
+                 retries=5, retry_base=1.0, retry_cap=30, request_timeout=None):
+        '''
+        retries, retry_base, retry_cap : number of tries in all, including
+                          the first one, and the initial and maximum delay
+                          in seconds between them, of the calls retried on
+                          transient api errors. The same for the
+                          retry_on_api_exception methods, whose last try
+                          is made on new connections
+        request_timeout : (connect, read) timeout in seconds of each api call,
+                          defaults to the cluster k8s_request_timeout, or
+                          REQUEST_TIMEOUT
+        '''
         if cluster:
             config_file = cluster['kube_config_file']
-        self.cfg = client.Configuration()
-        config.load_kube_config(config_file=config_file,
-                                client_configuration=self.cfg)
+        self._cfg_key = (config_file,
+                         cluster['master_public_ip'] if cluster else None)
+        cfg = _CFG_CACHE.get(self._cfg_key)
+        if cfg is None:
+            cfg = client.Configuration()
+            config.load_kube_config(config_file=config_file,
+                                    client_configuration=cfg)
+            _CFG_CACHE[self._cfg_key] = cfg
+        self.cfg = copy.deepcopy(cfg)
+        # a read timeout should surface to the caller rather than being
+        # retried by urllib3, only keep one reconnect for stale connections
+        self.cfg.retries = Retry(total=1, read=0)
+        # allow that many parallel requests, the default is 4
+        self.cfg.connection_pool_maxsize = 32
+        self.retries = retries
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        if request_timeout is None:
+            request_timeout = (cluster or {}).get('k8s_request_timeout',
+                                                  REQUEST_TIMEOUT)
+        # yaml gives a list, the client only accepts a number or a tuple
+        if isinstance(request_timeout, list):
+            request_timeout = tuple(request_timeout)
+        self.request_timeout = request_timeout
         self.cfg.assert_hostname = False
         configuration.assert_hostname = False
         if cluster:
@@ -46,50 +354,187 @@ class Client(object):
             self.cfg.host = host
             self.cfg.verify_ssl = False
 
-        self.init_clients()
         self.logger = logger or contrail_logging.getLogger(__name__)
+        self.init_clients(refresh=False)
     # end __init__
 
-    def init_clients(self):
+    def init_clients(self, refresh=True):
+        '''refresh=False uses the ApiClient shared by the Client objects of
+        the same cluster, along with its open connections.
+        refresh=True, as done by retry_on_api_exception after repeated
+        errors, gives this object an ApiClient of its own with new
+        connections. The other Client objects keep the shared one
+        '''
+        if refresh:
+            api_client = self._new_api_client()
+        else:
+            api_client = _API_CLIENT_CACHE.get(self._cfg_key)
+            if api_client is None:
+                api_client = self._new_api_client()
+                _API_CLIENT_CACHE[self._cfg_key] = api_client
+        self._close_own_api_client()
+        self.api_client = api_client
+        # the api handles are built from self.api_client on first use
+        for handle in self._API_HANDLES:
+            self.__dict__.pop(handle, None)
+        if get_os_env('TCUTILS_K8S_VERIFY') == '1':
+            _PROBE_EXECUTOR.submit(self._verify_connection)
+    # end init_clients
+
+    def _new_api_client(self):
         api_client = client.ApiClient(self.cfg)
-        self.res_v1_obj_h = client.CustomObjectsApi(api_client)
-        self.v1_h = client.CoreV1Api(api_client)
-        self.v1_h.read_namespace('default')
-        self.v1_networking = client.NetworkingV1Api(api_client)
-        self.apps_v1_h = client.AppsV1Api(api_client)
+        api_client.rest_client.pool_manager.connection_pool_kw[
+            'socket_options'] = KEEPALIVE_SOCKET_OPTIONS
+        return api_client
+
+    def _close_own_api_client(self):
+        '''Close the ApiClient of this object, unless it is the shared one
+        '''
+        api_client = self.__dict__.get('api_client')
+        if (api_client is not None and
+                api_client is not _API_CLIENT_CACHE.get(self._cfg_key)):
+            api_client.close()
+            api_client.rest_client.pool_manager.clear()
+
+    def close(self):
+        '''Release what this object does not share with the other Client
+        objects of the cluster, it goes back to the shared ApiClient
+        '''
+        self._close_own_api_client()
+        self.api_client = _API_CLIENT_CACHE.get(self._cfg_key)
+        for handle in self._API_HANDLES:
+            self.__dict__.pop(handle, None)
+    # end close
+
+    @cached_property
+    def res_v1_obj_h(self):
+        return client.CustomObjectsApi(self.api_client)
+
+    @cached_property
+    def v1_h(self):
+        return client.CoreV1Api(self.api_client)
+
+    @cached_property
+    def v1_networking(self):
+        return client.NetworkingV1Api(self.api_client)
+
+    @cached_property
+    def apps_v1_h(self):
+        return client.AppsV1Api(self.api_client)
+
+    def _verify_connection(self):
+        try:
+            self._call(self.v1_h.read_namespace, 'default')
+        except Exception as e:
+            self.logger.warning('Kubernetes apiserver %s is not reachable: %s',
+                                self.cfg.host, e)
+    # end _verify_connection
+
+    def _call(self, api_method, *args, **kwargs):
+        '''Invoke api_method, bounded by self.request_timeout unless the
+        caller passes its own _request_timeout
+        '''
+        kwargs.setdefault('_request_timeout', self.request_timeout)
+        return api_method(*args, **kwargs)
+
+    def _retrying(self, api_method, *args, **kwargs):
+        '''_call() api_method, retrying retriable errors with the same
+        backoff as retry_on_api_exception. Use only for idempotent calls
+        '''
+        return _call_with_retries(
+            lambda: self._call(api_method, *args, **kwargs), self.logger,
+            self.retries, self.retry_base, self.retry_cap)
+
+    def _create_retrying(self, read_back, api_method, *args, **kwargs):
+        '''_retrying() for a create api_method. A create which timed out or
+        failed with a 5xx may still have been applied, so a 409 on a retry
+        means an earlier try created the object. It is then read back with
+        read_back() and returned. With no read_back (the name is not known)
+        the 409 is raised
+        '''
+        tries = []
+
+        def create():
+            tries.append(api_method)
+            try:
+                return self._call(api_method, *args, **kwargs)
+            except ApiException as e:
+                if e.status != 409 or len(tries) == 1 or read_back is None:
+                    raise
+            self.logger.info('Object was created by an earlier try, '
+                             'reading it back')
+            return read_back()
+        return _call_with_retries(create, self.logger, self.retries,
+                                  self.retry_base, self.retry_cap)
+
+    def _watch_timeout(self, seconds):
+        '''_request_timeout of a watch which the server ends after seconds,
+        till when it may not send anything
+        '''
+        return _extend_read_timeout(self.request_timeout, seconds)
+
+    @property
+    def list_timeout(self):
+        '''request_timeout with twice the read timeout, for the calls which
+        read whole lists or objects of unbounded size
+        '''
+        return _extend_read_timeout(self.request_timeout)
+
+    def _paged_list(self, list_method, *args, page=500, **kwargs):
+        '''Generator over the items of a list api call, fetched from the
+        apiserver page items at a time using limit/_continue
+        '''
+        token = None
+        while True:
+            resp = self._retrying(list_method, *args, limit=page,
+                                  _continue=token, **kwargs)
+            for item in resp.items:
+                yield item
+            token = resp.metadata._continue
+            if not token:
+                return
 
     def create_namespace(self, name, isolation=False, ip_fabric_forwarding=False,
                          ip_fabric_snat=False, network_fqname=None):
         '''
         returns instance of class V1Namespace
         '''
-        body = client.V1Namespace()
-        body.metadata = client.V1ObjectMeta(name=name)
-        # initialize to allow different combinations
-        body.metadata.annotations = {}
+        # built up, to allow different combinations
+        annotations = {}
         if isolation:
-            body.metadata.annotations = {"opencontrail.org/isolation": "true"}
+            annotations["opencontrail.org/isolation"] = "true"
         if ip_fabric_forwarding:
-            body.metadata.annotations["opencontrail.org/ip_fabric_forwarding"] = "true"
+            annotations["opencontrail.org/ip_fabric_forwarding"] = "true"
         if ip_fabric_snat:
-            body.metadata.annotations["opencontrail.org/ip_fabric_snat"] = "true"
+            annotations["opencontrail.org/ip_fabric_snat"] = "true"
         if network_fqname:
-            body.metadata.annotations = {"opencontrail.org/network": "%s" % network_fqname}
-        resp = self.v1_h.create_namespace(body)
+            annotations["opencontrail.org/network"] = "%s" % network_fqname
+        body = client.V1Namespace(
+            metadata=client.V1ObjectMeta(name=name, annotations=annotations))
+        resp = self._call(self.v1_h.create_namespace, body)
         return resp
     # end create_namespace
 
     def delete_namespace(self, name):
-        return self.v1_h.delete_namespace(name=name, body=client.V1DeleteOptions())
+        return self._call(self.v1_h.delete_namespace, name=name,
+                          body=_EMPTY_DELETE_OPTS)
     # end delete_namespace
 
     def read_namespace(self, name):
-        return self.v1_h.read_namespace(name)
+        return self._call(self.v1_h.read_namespace, name)
 
     def _get_metadata(self, mdata_dict):
         if mdata_dict:
             return client.V1ObjectMeta(**mdata_dict)
 
+    def _build_meta(self, metadata, name=None):
+        '''Returns V1ObjectMeta of the metadata dict, named name if given
+        '''
+        metadata_obj = self._get_metadata(metadata) or client.V1ObjectMeta()
+        if name:
+            metadata_obj.name = name
+        return metadata_obj
+
     def _get_ingress_backend(self, backend_dict={}):
         port = client.V1ServiceBackendPort(
             number=backend_dict.get('service_port', 80))
@@ -132,31 +577,20 @@ class Client(object):
         '''
         Returns V1beta1Ingress object
         '''
-        if metadata is None:
-            metadata = {}
-        if default_backend is None:
-            default_backend = {}
-        if rules is None:
-            rules = []
-        if tls is None:
-            tls = []
-        if spec is None:
-            spec = {}
-        metadata_obj = self._get_metadata(metadata)
-        if name:
-            metadata_obj.name = name
-        spec['default_backend'] = self._get_ingress_backend(
-            default_backend or spec.get('backend', {}))
-        spec.pop('backend', None)
-
-        spec['rules'] = self._get_ingress_rules(rules or spec.get('rules', []))
-
-        spec['tls'] = self._get_ingress_tls(tls)
-
-        spec_obj = client.V1IngressSpec(**spec)
+        spec = spec or {}
+        metadata_obj = self._build_meta(metadata, name)
+        # built afresh so that the caller's spec dict is left untouched,
+        # other keys like ingress_class_name are passed on as they are
+        ing_spec = {k: v for k, v in spec.items() if k != 'backend'}
+        ing_spec.update(
+            default_backend=self._get_ingress_backend(
+                default_backend or spec.get('backend', {})),
+            rules=self._get_ingress_rules(rules or spec.get('rules', [])),
+            tls=self._get_ingress_tls(tls or []))
+        spec_obj = client.V1IngressSpec(**ing_spec)
         body = client.V1Ingress(metadata=metadata_obj,spec=spec_obj)
-        self.logger.info('Creating Ingress %s' % (metadata_obj.name))
-        resp = self.v1_networking.create_namespaced_ingress(namespace, body)
+        self.logger.info('Creating Ingress %s', metadata_obj.name)
+        resp = self._call(self.v1_networking.create_namespaced_ingress, namespace, body)
         return resp
     # end create_ingress
 
@@ -170,9 +604,8 @@ class Client(object):
     def delete_ingress(self,
                        namespace,
                        name):
-        self.logger.info('Deleting Ingress : %s' % (name))
-        body = client.V1DeleteOptions()
-        return self.v1_networking.delete_namespaced_ingress(name, namespace)
+        self.logger.info('Deleting Ingress : %s', name)
+        return self._call(self.v1_networking.delete_namespaced_ingress, name, namespace)
     # end delete_ingress
 
     def _get_label_selector(self, match_labels={}, match_expressions=[]):
@@ -213,11 +646,8 @@ class Client(object):
         return client.V1NetworkPolicyPort(port=port, protocol=protocol)
 
     def _get_network_policy_port_list(self, port_list):
-        port_obj_list = []
-        for port_dict in port_list:
-            port_obj = self._get_network_policy_port(**port_dict)
-            port_obj_list.append(port_obj)
-        return port_obj_list
+        return [self._get_network_policy_port(**port_dict)
+                for port_dict in port_list]
     # end _get_network_policy_port_list
 
     def _get_network_policy_spec(self, spec):
@@ -256,21 +686,19 @@ class Client(object):
         '''
         Returns V1NetworkPolicy object
         '''
-        if metadata is None:
-            metadata = {}
-        if spec is None:
-            spec = {}
-        _ = self.v1_networking.read_namespaced_network_policy(policy_name, namespace)
-        metadata_obj = self._get_metadata(metadata)
+        spec = spec or {}
+        _ = self._call(self.v1_networking.read_namespaced_network_policy,
+                       policy_name, namespace)
+        metadata_obj = self._build_meta(metadata)
 
         spec_obj = self._get_network_policy_spec(spec)
 
         body = client.V1NetworkPolicy(
             metadata=metadata_obj,
             spec=spec_obj)
-        self.logger.info('Updating Network Policy %s' % (policy_name))
-        resp = self.v1_networking.patch_namespaced_network_policy(
-            policy_name, namespace, body)
+        self.logger.info('Updating Network Policy %s', policy_name)
+        resp = self._call(self.v1_networking.patch_namespaced_network_policy,
+                          policy_name, namespace, body)
         return resp
     # end update_network_policy
 
@@ -300,30 +728,25 @@ class Client(object):
 
         Returns V1NetworkPolicy object
         '''
-        if metadata is None:
-            metadata = {}
-        if spec is None:
-            spec = {}
-        metadata_obj = self._get_metadata(metadata)
-        if name:
-            metadata_obj.name = name
+        spec = spec or {}
+        metadata_obj = self._build_meta(metadata, name)
         spec_obj = self._get_network_policy_spec(spec)
 
         body = client.V1NetworkPolicy(
             metadata=metadata_obj,
             spec=spec_obj)
-        self.logger.info('Creating Network Policy %s' % (metadata_obj.name))
-        resp = self.v1_networking.create_namespaced_network_policy(namespace, body)
+        self.logger.info('Creating Network Policy %s', metadata_obj.name)
+        resp = self._call(self.v1_networking.create_namespaced_network_policy,
+                          namespace, body)
         return resp
     # end create_network_policy
 
     def delete_network_policy(self,
                               namespace,
                               name):
-        self.logger.info('Deleting Network Policy : %s' % (name))
-        body = client.V1DeleteOptions()
-        return self.v1_networking.delete_namespaced_network_policy(
-            name, namespace, body)
+        self.logger.info('Deleting Network Policy : %s', name)
+        return self._call(self.v1_networking.delete_namespaced_network_policy,
+                          name, namespace, body=_EMPTY_DELETE_OPTS)
     # end delete_network_policy
 
     def create_service(self,
@@ -347,28 +770,23 @@ class Client(object):
                                 }
                         ]
         '''
-        if metadata is None:
-            metadata = {}
-        if spec is None:
-            spec = {}
-        metadata_obj = self._get_metadata(metadata)
-        if name:
-            metadata_obj.name = name
+        spec = spec or {}
+        metadata_obj = self._build_meta(metadata, name)
         spec_obj = client.V1ServiceSpec(**spec)
         body = client.V1Service(
             metadata=metadata_obj,
             spec=spec_obj)
-        self.logger.info('Creating service %s' % (metadata_obj.name))
-        resp = self.v1_h.create_namespaced_service(namespace, body)
+        self.logger.info('Creating service %s', metadata_obj.name)
+        resp = self._call(self.v1_h.create_namespaced_service, namespace, body)
         return resp
     # end create_service
 
     def delete_service(self,
                        namespace,
                        name):
-        self.logger.info('Deleting service : %s' % (name))
-        body = client.V1DeleteOptions()
-        return self.v1_h.delete_namespaced_service(name, namespace, body)
+        self.logger.info('Deleting service : %s', name)
+        return self._call(self.v1_h.delete_namespaced_service, name, namespace,
+                          body=_EMPTY_DELETE_OPTS)
 
     def create_pod(self,
                    namespace='default',
@@ -393,21 +811,23 @@ class Client(object):
         return V1Pod instance
 
         '''
-        if metadata is None:
-            metadata = {}
-        if spec is None:
-            spec = {}
-        metadata_obj = self._get_metadata(metadata)
-        if name:
-            metadata_obj.name = name
-        spec_obj = self._get_pod_spec(metadata_obj.name, spec)
-        body = client.V1Pod(metadata=metadata_obj,
-                            spec=spec_obj)
-        self.logger.info('Creating Pod %s' % (metadata_obj.name))
-        resp = self.v1_h.create_namespaced_pod(namespace, body)
+        body = self._get_pod(name, metadata, spec)
+        self.logger.info('Creating Pod %s', body.metadata.name)
+        resp = self._call(self.v1_h.create_namespaced_pod, namespace, body)
         return resp
     # end create_pod
 
+    def _get_pod(self, name=None, metadata=None, spec=None):
+        '''
+        return V1Pod object, see create_pod for the args
+        '''
+        spec = spec or {}
+        metadata_obj = self._build_meta(metadata, name)
+        spec_obj = self._get_pod_spec(metadata_obj.name, spec)
+        return client.V1Pod(metadata=metadata_obj,
+                            spec=spec_obj)
+    # end _get_pod
+
     def delete_pod(self, namespace, name, grace_period_seconds=0, orphan_dependents=False):
         '''
         grace_period_seconds: Type  int , The duration in seconds before the object
@@ -421,9 +841,8 @@ class Client(object):
                               If true/false, the \"orphan\" finalizer will be added
                               to/removed from the object's finalizers list. (optional)
         '''
-        body = client.V1DeleteOptions()
-        self.logger.info('Deleting pod %s:%s' % (namespace, name))
-        return self.v1_h.delete_namespaced_pod(name, namespace)
+        self.logger.info('Deleting pod %s:%s', namespace, name)
+        return self._call(self.v1_h.delete_namespaced_pod, name, namespace)
 
     def read_pod(self, name, namespace='default'):
         '''
@@ -432,14 +851,14 @@ class Client(object):
         export = Type bool | Should this value be exported.  Export strips fields
                             that a user can not specify. (optional)
         '''
-        return self.v1_h.read_namespaced_pod(name, namespace)
+        return self._call(self.v1_h.read_namespaced_pod, name, namespace)
     # end read_pod
 
     def _get_container(self, pod_name=None, kwargs=None):
         '''
         return container object
         '''
-        kwargs = kwargs or {}
+        kwargs = dict(kwargs or {})
         if not kwargs.get('name'):
             kwargs['name'] = pod_name or get_random_name('container')
         ports_obj = []
@@ -456,27 +875,27 @@ class Client(object):
         container_objs = []
         container_name = None
         containers = spec.get('containers', [])
-        for item in containers:
+        for idx, item in enumerate(containers):
             if name:
-                container_name = '%s-%s' % (name, containers.index(item))
+                container_name = '%s-%s' % (name, idx)
             container_objs.append(self._get_container(container_name, item))
-        spec['containers'] = container_objs
-        spec_obj = client.V1PodSpec(**spec)
+        # the caller's spec is left as is, it may be used for more pods
+        spec_obj = client.V1PodSpec(**dict(spec, containers=container_objs))
         return spec_obj
     # end create_spec
 
     def get_pods(self, namespace='default', **kwargs):
         ''' Returns V1PodList
         '''
-        return self.v1_h.list_namespaced_pod(namespace, **kwargs)
+        return self._call(self.v1_h.list_namespaced_pod, namespace, **kwargs)
 
     def read_pod_status(self, name, namespace='default', exact=True, export=True):
         '''
         Get the POD status
         '''
-        return self.v1_h.read_namespaced_pod_status(name, namespace)
+        return self._call(self.v1_h.read_namespaced_pod_status, name, namespace)
 
-    @retry_on_api_exception("init_clients", tries=5, delay=5)
+    @retry_on_api_exception("init_clients")
     def exec_cmd_on_pod(self, name, cmd, namespace='default', stderr=True,
                         stdin=False, stdout=True, tty=False,
                         shell='/bin/bash -l -c', container=None):
@@ -496,31 +915,36 @@ class Client(object):
         # end exec_cmd_on_pod
 
     def set_isolation(self, namespace, enable=True):
-        ns_obj = self.v1_h.read_namespace(namespace)
-        if not getattr(ns_obj.metadata, 'annotations', None):
-            ns_obj.metadata.annotations = {}
-        kv = {'net.beta.kubernetes.io/network-policy': '{"ingress": { "isolation": "DefaultDeny" }}'}
+        value = None
         if enable:
-            ns_obj.metadata.annotations.update(kv)
-        else:
-            ns_obj.metadata.annotations[
-                'net.beta.kubernetes.io/network-policy'] = None
-        self.v1_h.patch_namespace(namespace, ns_obj)
+            value = '{"ingress": { "isolation": "DefaultDeny" }}'
+        # a dict body is sent as a strategic merge patch, None removes the key
+        patch = {'metadata': {'annotations': {
+            'net.beta.kubernetes.io/network-policy': value}}}
+        self._call(self.v1_h.patch_namespace, namespace, patch)
     # end set_isolation
 
     def _wa_client_bug_18_for_ingress(self, obj):
         '''
         Dirty WA https://github.com/kubernetes-incubator/client-python/issues/18
         '''
-        default_backend = obj.spec.backend
-        if default_backend:
-            default_backend.service_port = int(default_backend.service.port.number)
-        if obj.spec.rules:
-            for rule in obj.spec.rules:
-                if not rule or not rule.http or rule.http.paths:
-                    continue
-                for path in rule.http.paths:
-                    path.backend.service_port = int(path.backend.service.port.number)
+        default_backend = obj.spec.default_backend
+        if not (default_backend or obj.spec.rules):
+            return obj
+        backends = [default_backend] if default_backend else []
+        for rule in obj.spec.rules or []:
+            if not rule or not rule.http or not rule.http.paths:
+                continue
+            backends.extend(path.backend for path in rule.http.paths)
+        for backend in backends:
+            # a resource backend has no service port
+            service = backend and backend.service
+            if not service or not service.port:
+                continue
+            port = service.port
+            # a named service port has no number
+            backend.service_port = (port.name if port.number is None
+                                    else int(port.number))
         return obj
     # end _wa_client_bug_18_for_ingress
 
@@ -530,31 +954,32 @@ class Client(object):
         if tls is None: it will be disabled
         '''
         tls = tls or []
-        ing_obj = self.v1_networking.read_namespaced_ingress(name, namespace)
+        ing_obj = self._call(self.v1_networking.read_namespaced_ingress, name, namespace)
         ing_obj.spec.tls = self._get_ingress_tls(tls)
         self._wa_client_bug_18_for_ingress(ing_obj)
 
-        return self.v1_networking.patch_namespaced_ingress(ing_obj.metadata.name, namespace, ing_obj)
+        return self._call(self.v1_networking.patch_namespaced_ingress,
+                          ing_obj.metadata.name, namespace, ing_obj)
     # end set_ingress_tls
 
     def set_pod_label(self, namespace, pod_name, label_dict):
         metadata = {'labels': label_dict}
         body = client.V1Pod(metadata=self._get_metadata(metadata))
-        return self.v1_h.patch_namespaced_pod(pod_name, namespace, body)
+        return self._call(self.v1_h.patch_namespaced_pod, pod_name, namespace, body)
     # end set_pod_label
 
     def set_namespace_label(self, namespace, label_dict):
         metadata = {'labels': label_dict}
         body = client.V1Namespace(metadata=self._get_metadata(metadata))
-        return self.v1_h.patch_namespace(namespace, body)
+        return self._call(self.v1_h.patch_namespace, namespace, body)
     # end set_namespace_label
 
     def is_namespace_present(self, namespace):
-        try:
-            self.v1_h.read_namespace(namespace)
-            return True
-        except ApiException:
-            return False
+        # an absent namespace is an empty list rather than a 404 exception
+        resp = self._call(self.v1_h.list_namespace,
+                          field_selector='metadata.name=%s' % (namespace),
+                          limit=1)
+        return len(resp.items) > 0
 
     # end is_namespace_present
     def _get_selector(self, label_selector):
@@ -616,84 +1041,137 @@ class Client(object):
         '''
         Returns AppsV1beta1Deployment object
         '''
-        if metadata is None:
-            metadata = {}
-        if spec is None:
-            spec = {}
-        metadata_obj = self._get_metadata(metadata)
-        if name:
-            metadata_obj.name = name
+        spec = spec or {}
+        metadata_obj = self._build_meta(metadata, name)
 
         spec_obj = self._get_deployment_spec(spec)
         body = client.V1Deployment(
             metadata=metadata_obj,
             spec=spec_obj)
-        self.logger.info('Creating Deployment %s' % (metadata_obj.name))
-        resp = self.apps_v1_h.create_namespaced_deployment(namespace, body)
+        self.logger.info('Creating Deployment %s', metadata_obj.name)
+        resp = self._call(self.apps_v1_h.create_namespaced_deployment, namespace, body)
         return resp
     # end create_deployment
 
     def delete_deployment(self, namespace, name):
-        self.logger.info('Deleting Deployment : %s' % (name))
-        body = client.V1DeleteOptions()
-        return self.apps_v1_h.delete_namespaced_deployment(name, namespace)
+        self.logger.info('Deleting Deployment : %s', name)
+        return self._call(self.apps_v1_h.delete_namespaced_deployment, name, namespace)
     # end delete_deployment
 
-    def set_deployment_replicas(self, namespace, deployment, count=0):
-        self.logger.info('Setting replicas of deployment %s to %s' % (
-            deployment, count))
-        dep_obj = self.apps_v1_h.read_namespaced_deployment(deployment, namespace)
+    def set_deployment_replicas(self, namespace, deployment, count=0,
+                                wait=False):
+        '''
+        wait : if True, also wait for the deployment to report count replicas
+        '''
+        self.logger.info('Setting replicas of deployment %s to %s',
+                         deployment, count)
+        dep_obj = self._call(self.apps_v1_h.read_namespaced_deployment,
+                             deployment, namespace)
         dep_obj.spec.replicas = count
-        return self.apps_v1_h.patch_namespaced_deployment(deployment, namespace, dep_obj)
-        time.sleep(10)
+        resp = self._call(self.apps_v1_h.patch_namespaced_deployment,
+                          deployment, namespace, dep_obj)
+        if wait:
+            self._wait_for_deployment_replicas(namespace, deployment, count)
+        return resp
     # end set_deployment_replicas
 
+    def _wait_for_deployment_replicas(self, namespace, deployment, count,
+                                      timeout=30):
+        '''Watch the deployment for upto timeout seconds till its status
+        reports count replicas. Returns True if it did
+        '''
+        watcher = watch.Watch()
+        for event in watcher.stream(
+                self.apps_v1_h.list_namespaced_deployment, namespace,
+                field_selector='metadata.name=%s' % (deployment),
+                timeout_seconds=timeout,
+                _request_timeout=self._watch_timeout(timeout)):
+            # status.replicas is not set once scaled down to 0
+            if (event['object'].status.replicas or 0) == count:
+                watcher.stop()
+                return True
+        self.logger.debug('Deployment %s did not reach %s replicas in %ss',
+                          deployment, count, timeout)
+        return False
+    # end _wait_for_deployment_replicas
+
     def get_replica_set(self, namespace, deployment=None):
-        try:
-            rs_objs = self.apps_v1_h.list_namespaced_replica_set(namespace)
-        except ApiException as e:
-            try:
-                rs_objs = self.v1_networking.list_namespaced_replica_set(namespace)
-            except ApiException as e:
-                self.logger.debug('ReplicaSet not present')
-        finally:
-            ret_list = []
-            for rs_obj in rs_objs.items:
-                if not deployment:
-                    ret_list.append(rs_obj)
-                elif deployment in rs_obj.metadata.name:
-                    ret_list.append(rs_obj)
-            return ret_list
+        ret_list = []
+        for rs_obj in self._paged_list(
+                self.apps_v1_h.list_namespaced_replica_set, namespace):
+            if not deployment:
+                ret_list.append(rs_obj)
+            elif deployment in rs_obj.metadata.name:
+                ret_list.append(rs_obj)
+        return ret_list
     # end get_replica_set
 
     def get_pods_list(self, namespace, replica_set=None, deployment=None):
         '''replica_set : name of the replica set which match with the pods
         '''
-        pods = self.v1_h.list_namespaced_pod(namespace)
-        ret_list = []
-        replica_sets = []
         if deployment:
             rs_objs = self.get_replica_set(namespace, deployment)
-            replica_sets = [x.metadata.name for x in rs_objs]
-        elif replica_set:
-            replica_sets = [replica_set]
+            # pod-template-hash is unique per replica set, so a single set
+            # based selector gets the pods of all of them from the apiserver
+            rs_hashes = [(x.spec.selector.match_labels or {}).get(
+                         'pod-template-hash') for x in rs_objs]
+            rs_hashes = [x for x in rs_hashes if x]
+            if not rs_hashes:
+                return []
+            label_selector = 'pod-template-hash in (%s)' % (
+                ','.join(rs_hashes))
         else:
-            return pods.items
-        for pod in pods.items:
-            for rs in replica_sets:
-                if rs in pod.metadata.name:
-                    ret_list.append(pod)
-        return ret_list
+            label_selector = self._get_rs_pod_selector(replica_set)
+        return list(self._paged_list(self.v1_h.list_namespaced_pod, namespace,
+                                     label_selector=label_selector))
     # end get_pods_list
 
-    @retry(delay=3, tries=20)
-    def wait_till_pod_cleanup(self, namespace, replica_set=None):
-        if self.get_pods_list(namespace, replica_set):
+    def _get_rs_pod_selector(self, replica_set):
+        '''Pods of a deployment's replica set are labelled with its
+        pod-template-hash. replica_set is a V1ReplicaSet, whose selector has
+        the hash, or the name of one, whose suffix is the hash for the
+        replica sets named by a deployment
+        '''
+        if isinstance(replica_set, client.V1ReplicaSet):
+            rs_hash = (replica_set.spec.selector.match_labels or {}).get(
+                'pod-template-hash')
+            replica_set = rs_hash or replica_set.metadata.name
+        if replica_set:
+            return 'pod-template-hash=%s' % (replica_set.rsplit('-', 1)[-1])
+
+    def wait_till_pod_cleanup(self, namespace, replica_set=None, timeout=60):
+        '''Wait for upto timeout seconds for the pods of replica_set, a
+        V1ReplicaSet or its name, to go away. Lists the pods once and then
+        watches for their DELETED events instead of polling
+        '''
+        if isinstance(replica_set, client.V1ReplicaSet):
+            rs_name = replica_set.metadata.name
+        else:
+            rs_name = replica_set
+        label_selector = self._get_rs_pod_selector(replica_set)
+        pods = self._call(self.v1_h.list_namespaced_pod, namespace,
+                          label_selector=label_selector)
+        pending = set(pod.metadata.name for pod in pods.items)
+        if pending:
             self.logger.debug('One or more pods still in replica set..waiting')
+            watcher = watch.Watch()
+            for event in watcher.stream(
+                    self.v1_h.list_namespaced_pod, namespace,
+                    label_selector=label_selector,
+                    resource_version=pods.metadata.resource_version,
+                    timeout_seconds=timeout,
+                    _request_timeout=self._watch_timeout(timeout)):
+                if event['type'] != 'DELETED':
+                    continue
+                pending.discard(event['object'].metadata.name)
+                if not pending:
+                    watcher.stop()
+        if pending:
+            self.logger.debug('Pods %s of replica set %s not cleaned up',
+                              list(pending), rs_name)
             return False
-        else:
-            self.logger.debug('No pods managed by replica set %s' % (replica_set))
-            return True
+        self.logger.debug('No pods managed by replica set %s', rs_name)
+        return True
     # end wait_till_pod_cleanup
 
     def delete_replica_set(self, namespace, deployment=None):
@@ -703,26 +1181,26 @@ class Client(object):
         this set the replica count of deployment to 0, waits for the pods to
         go away and then delete the rs
         '''
-        self.logger.info('Deleting replica set of deployment %s' % (deployment))
-        body = client.V1DeleteOptions()
+        self.logger.info('Deleting replica set of deployment %s', deployment)
         self.set_deployment_replicas(namespace, deployment, 0)
         rs_objs = self.get_replica_set(namespace, deployment)
-        for rs_obj in rs_objs:
-            name = rs_obj.metadata.name
-            self.wait_till_pod_cleanup(namespace, name)
-            self.apps_v1_h.delete_namespaced_replica_set(name, namespace)
+        if not rs_objs:
+            return
+
+        def _purge_rs(rs_obj):
+            self.wait_till_pod_cleanup(namespace, rs_obj)
+            self._call(self.apps_v1_h.delete_namespaced_replica_set,
+                       rs_obj.metadata.name, namespace)
+        # the replica sets are independent, wait for and delete them in
+        # parallel. list() re-raises the first failure, if any
+        with ThreadPoolExecutor(max_workers=min(8, len(rs_objs))) as executor:
+            list(executor.map(_purge_rs, rs_objs))
     # end delete_replica_set
 
     def set_service_isolation(self, namespace, enable=True):
-        ns_obj = self.v1_h.read_namespace(namespace)
-        if not getattr(ns_obj.metadata, 'annotations', None):
-            ns_obj.metadata.annotations = {}
-        if enable:
-            kv = {'opencontrail.org/isolation.service': 'true'}
-        else:
-            kv = {'opencontrail.org/isolation.service': 'false'}
-        ns_obj.metadata.annotations.update(kv)
-        self.v1_h.patch_namespace(namespace, ns_obj)
+        patch = {'metadata': {'annotations': {
+            'opencontrail.org/isolation.service': 'true' if enable else 'false'}}}
+        self._call(self.v1_h.patch_namespace, namespace, patch)
     # end set_service_isolation
 
     def create_secret(self, namespace='default', name=None, metadata=None, data=None):
@@ -738,29 +1216,24 @@ class Client(object):
         '''
         kind = 'Secret'
         obj_type = 'kubernetes.io/tls'
-        if metadata is None:
-            metadata = {}
-        if data is None:
-            data = {}
-        metadata_obj = self._get_metadata(metadata)
-        if name:
-            metadata_obj.name = name
+        data = data or {}
+        metadata_obj = self._build_meta(metadata, name)
         body = client.V1Secret(
             metadata=metadata_obj,
             data=data,
             kind=kind,
             type=obj_type)
-        self.logger.info('Creating secret %s' % (metadata_obj.name))
-        resp = self.v1_h.create_namespaced_secret(namespace, body)
+        self.logger.info('Creating secret %s', metadata_obj.name)
+        resp = self._call(self.v1_h.create_namespaced_secret, namespace, body)
         return resp
     # end create_secret
 
     def delete_secret(self,
                       namespace,
                       name):
-        self.logger.info('Deleting secret : %s' % (name))
-        body = client.V1DeleteOptions()
-        return self.v1_h.delete_namespaced_secret(name, namespace, body)
+        self.logger.info('Deleting secret : %s', name)
+        return self._call(self.v1_h.delete_namespaced_secret, name, namespace,
+                          body=_EMPTY_DELETE_OPTS)
     # end delete_secret
 
     def create_custom_resource_object(
@@ -773,36 +1246,48 @@ class Client(object):
             plural="network-attachment-definitions"):
         '''Routine to create the custome resource object in k8s environment in our case
            its NetworkAttachmentDefinition to support multiple interfaces to the POD
+           Raises TransientK8sError or PermanentK8sError on failure
         '''
-        if metadata is None:
-            metadata = {}
-        if spec is None:
-            spec = {}
-        metadata_obj = self._get_metadata(metadata)
-        if name:
-            metadata_obj.name = name
-        if namespace:
-            metadata_obj.namespace = namespace
-        group = apiVersion.split("/")[0]
-        body = {
-            'apiVersion': apiVersion,
-            'kind': nad,
-            'metadata': metadata_obj,
-            'spec': spec}
+        group, version = apiVersion.split("/", 1)
+        body = self._get_custom_resource(namespace, name, metadata, spec,
+                                         apiVersion, nad)
 
-        version = apiVersion.split("/")[-1]
         # create a network attachement definition in the given namespace
+        read_back = None
+        if body['metadata'].get('name'):
+            read_back = functools.partial(
+                self._call, self.res_v1_obj_h.get_namespaced_custom_object,
+                group, version, namespace, plural, body['metadata']['name'])
         try:
-            api_response = self.res_v1_obj_h.create_namespaced_custom_object(
+            api_response = self._create_retrying(
+                read_back, self.res_v1_obj_h.create_namespaced_custom_object,
                 group, version, namespace, plural, body, pretty="true")
-            self.logger.info('Creating NetworkAttachment %s:%s' % (namespace, name))
-            pprint(api_response)
+            self.logger.info('Creating NetworkAttachment %s:%s', namespace, name)
+            self.logger.debug('api_response=%s', api_response)
         except ApiException as e:
-            print("Exception when calling CustomObjectsApi->create_cluster_custom_object: %s\n" % e)
-            return None
+            self.logger.exception("Exception calling %s",
+                                  "CustomObjectsApi->create_namespaced_custom_object")
+            raise _k8s_error(e) from e
         return api_response
     # end create_custom_resource_object
 
+    def _get_custom_resource(self, namespace, name, metadata, spec,
+                             apiVersion, nad):
+        '''Returns the body of a custom resource object
+        '''
+        # the body is sent as is, a plain dict skips the model
+        # serialization. The keys are those of the api, as for spec
+        meta_dict = dict(metadata or {})
+        if name:
+            meta_dict['name'] = name
+        if namespace:
+            meta_dict['namespace'] = namespace
+        return {
+            'apiVersion': apiVersion,
+            'kind': nad,
+            'metadata': meta_dict,
+            'spec': spec or {}}
+
     def delete_custom_resource_object(
             self, name=None,
             namespace='default',
@@ -811,19 +1296,26 @@ class Client(object):
             plural="network-attachment-definitions",
             grace_period_seconds=0):
         '''Routine deletes the custome resource object created in k8s plaotform
+           Returns None if it is not found, raises TransientK8sError or
+           PermanentK8sError on other failures
         '''
-        body = client.V1DeleteOptions()
-        group = apiVersion.split("/")[0]
-        version = apiVersion.split("/")[-1]
+        group, version = apiVersion.split("/", 1)
         try:
-            api_response = self.res_v1_obj_h.delete_namespaced_custom_object(
+            api_response = self._retrying(
+                self.res_v1_obj_h.delete_namespaced_custom_object,
                 group, version, namespace, plural,
-                name, body, grace_period_seconds=grace_period_seconds)
-            self.logger.info('Deleted NetworkAttachment %s:%s' % (namespace, name))
-            pprint(api_response)
+                name, body=_EMPTY_DELETE_OPTS,
+                grace_period_seconds=grace_period_seconds)
+            self.logger.info('Deleted NetworkAttachment %s:%s', namespace, name)
+            self.logger.debug('api_response=%s', api_response)
         except ApiException as e:
-            print("Exception when calling CustomObjectsApi->delete_namespaced_custom_object: %s\n" % e)
-            return None
+            if e.status == 404:
+                self.logger.debug('Custom resource %s:%s not found',
+                                  namespace, name)
+                return None
+            self.logger.exception("Exception calling %s",
+                                  "CustomObjectsApi->delete_namespaced_custom_object")
+            raise _k8s_error(e) from e
         return api_response
     # end delete_custom_resource_object
 
@@ -833,17 +1325,26 @@ class Client(object):
             apiVersion='k8s.cni.cncf.io/v1',
             plural="network-attachment-definitions"):
         '''Routine reads the custome resource object created in k8s plaotform
+           Returns None if it is not found, raises TransientK8sError or
+           PermanentK8sError on other failures
         '''
 
-        group = apiVersion.split("/")[0]
-        version = apiVersion.split("/")[-1]
+        group, version = apiVersion.split("/", 1)
 
         try:
-            api_response = self.res_v1_obj_h.get_namespaced_custom_object(group, version, namespace, plural, name)
-            pprint(api_response)
+            api_response = self._retrying(
+                self.res_v1_obj_h.get_namespaced_custom_object,
+                group, version, namespace, plural, name,
+                _request_timeout=self.list_timeout)
+            self.logger.debug('api_response=%s', api_response)
         except ApiException as e:
-            print("Exception when calling CustomObjectsApi->get_namespaced_custom_object: %s\n" % e)
-            return None
+            if e.status == 404:
+                self.logger.debug('Custom resource %s:%s not found',
+                                  namespace, name)
+                return None
+            self.logger.exception("Exception calling %s",
+                                  "CustomObjectsApi->get_namespaced_custom_object")
+            raise _k8s_error(e) from e
         return api_response
 
     # Create te daemonset
@@ -853,20 +1354,22 @@ class Client(object):
         '''
         Returns AppsV1beta1DaemonSet object
         '''
-        if metadata is None:
-            metadata = {}
-        if spec is None:
-            spec = {}
-        metadata_obj = self._get_metadata(metadata)
-        if name:
-            metadata_obj.name = name
+        spec = spec or {}
+        metadata_obj = self._build_meta(metadata, name)
 
         spec_obj = self._get_daemonset_spec(spec)
         body = client.V1DaemonSet(
             metadata=metadata_obj,
             spec=spec_obj)
-        self.logger.info('Creating DaemonSet %s' % (metadata_obj.name))
-        resp = self.apps_v1_h.create_namespaced_daemon_set(namespace, body, pretty='true')
+        self.logger.info('Creating DaemonSet %s', metadata_obj.name)
+        read_back = None
+        if metadata_obj.name:
+            read_back = functools.partial(
+                self._call, self.apps_v1_h.read_namespaced_daemon_set,
+                metadata_obj.name, namespace)
+        resp = self._create_retrying(
+            read_back, self.apps_v1_h.create_namespaced_daemon_set,
+            namespace, body, pretty='true')
         return resp
 
     # read the spec of te deamonset object
@@ -887,32 +1390,49 @@ class Client(object):
                          name,
                          namespace="default"):
         '''Delete the  daemonset '''
+        self.logger.info('Deleting Daemonset : %s', name)
         try:
-            api_response = self.apps_v1_h.read_namespaced_daemon_set(name, namespace)
-            pprint(api_response)
-            self.logger.info('Deleting Daemonset : %s' % (name))
-            body = client.V1DeleteOptions()
-            return self.apps_v1_h.delete_namespaced_daemon_set(
-                name, namespace, body, orphan_dependents=False)
-        except ApiException:
-            self.logger.info('Deamonset %s not found' % (name))
+            return self._retrying(
+                self.apps_v1_h.delete_namespaced_daemon_set,
+                name, namespace, body=_EMPTY_DELETE_OPTS,
+                orphan_dependents=False)
+        except ApiException as e:
+            if e.status != 404:
+                raise
+            self.logger.info('Deamonset %s not found', name)
             return None
 
     def get_kubernetes_compute_labels(self):
         '''
            Get list of all nodes with label computenode, and no of computes
         '''
-        compute_count = 0
         compute_label_list = []
-        nodes = self.v1_h.list_node()
-
-        for node in nodes.items:
-            label = node.metadata.labels.get('computenode', None)
+        for node in self._node_cache.get():
+            label = (node.metadata.labels or {}).get('computenode')
             if label:
                 compute_label_list.append(label)
-                compute_count += 1
+        return compute_label_list, len(compute_label_list)
 
-        return compute_label_list, compute_count
+    @property
+    def _node_cache(self):
+        '''The _NodeCache of the cluster, built on the shared ApiClient.
+        The first Client to use it sets its retries and request_timeout
+        '''
+        node_cache = _NODE_CACHES.get(self._cfg_key)
+        if node_cache is None:
+            node_cache = _NODE_CACHES.setdefault(self._cfg_key, _NodeCache(
+                client.CoreV1Api(_API_CLIENT_CACHE[self._cfg_key]),
+                self.logger, self.retries, self.retry_base, self.retry_cap,
+                self.request_timeout))
+        return node_cache
+
+    def stop_node_watch(self):
+        '''Stop the background node watch of the cluster, for all of its
+        Client objects. It is started again when the nodes are next needed
+        '''
+        node_cache = _NODE_CACHES.get(self._cfg_key)
+        if node_cache:
+            node_cache.close()
 
     def set_label_for_hbf_nodes(self, nodes_list_spec=None,
                                 labels=None,
@@ -923,36 +1443,72 @@ class Client(object):
             -Label that need to be applied on the k8s/hbf Nodes
         '''
         if nodes_list_spec is None:
-            nodes_list_spec = self.v1_h.list_node()
-        if labels is None:
-            labels = {"labels": {"type": "hbf"}}
+            nodes = self._node_cache.get()
         else:
-            labels = {"labels": labels}
-        body = {"metadata": labels}
+            nodes = nodes_list_spec.items
+        if labels is None:
+            labels = {"type": "hbf"}
         master_label = 'node-role.kubernetes.io/master'
+        # json patch (RFC 6902) paths of the labels, '~' and '/' in the
+        # keys are escaped as per RFC 6901
+        paths = dict((key, '/metadata/labels/' +
+                      key.replace('~', '~0').replace('/', '~1'))
+                     for key in list(labels) + [node_selector] if key)
+
+        log_info = self.logger.info
+        patches = []
+        for node in nodes:
+            node_labels = node.metadata.labels
+            if master_label in node_labels:
+                continue
+            nodename = node_labels.get('kubernetes.io/hostname')
+            log_info('compute node name : %s', nodename)
+            node_values = dict(labels)
+            if node_selector:
+                node_values[node_selector] = nodename
+            # only the labels which differ are patched, and a node which
+            # has them all already is not. A None value unsets the label,
+            # json patch can only remove a label which is there
+            patch = []
+            for key, value in node_values.items():
+                if value is None:
+                    if key in node_labels:
+                        patch.append({'op': 'remove', 'path': paths[key]})
+                elif node_labels.get(key) != value:
+                    patch.append({'op': 'add', 'path': paths[key],
+                                  'value': value})
+            if patch:
+                patches.append((nodename, patch))
+        if not patches:
+            return True
 
-        for node in nodes_list_spec.items:
-            if master_label not in node.metadata.labels:
-                nodename = node.metadata.labels.get('kubernetes.io/hostname')
-                self.logger.info('compute node name : %s' % (nodename))
-                if node_selector:
-                    body['metadata']['labels'][node_selector] = nodename
+        # patch the nodes in parallel, at most 10 at a time so as not to
+        # flood the apiserver. A list body is sent as a json patch
+        result = True
+        patch_node = self.v1_h.patch_node
+        with ThreadPoolExecutor(max_workers=min(10, len(patches))) as executor:
+            futures = [executor.submit(self._retrying, patch_node,
+                                       nodename, patch)
+                       for nodename, patch in patches]
+            for future in as_completed(futures):
                 try:
-                    response = self.v1_h.patch_node(nodename, body)
+                    response = future.result()
                     self.logger.info(response)
+                    # so that the new labels are seen without waiting for
+                    # the watch event
+                    self._node_cache.update('MODIFIED', response)
                 except ApiException as e:
-                    self.logger.error("Exception in  CoreV1Api->patch_node:%s\n" % e)
-                    return False
-        return True
+                    self.logger.error("Exception in  CoreV1Api->patch_node:%s\n", e)
+                    result = False
+        return result
 
 
 if __name__ == '__main__':
     c1 = Client()
     pods = c1.get_pods()
-    for pod in pods.items:
-        print("%s\t%s\t%s" % (pod.metadata.name,
-                              pod.status.phase,
-                              pod.status.pod_ip))
+    sys.stdout.write(''.join(
+        f"{pod.metadata.name}\t{pod.status.phase}\t{pod.status.pod_ip}\n"
+        for pod in pods.items))
 
     dep = c1.create_deployment(
         metadata={'name': 'test-deployment'},
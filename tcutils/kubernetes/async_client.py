@@ -0,0 +1,160 @@
+import asyncio
+import ssl
+
+import aiohttp
+from kubernetes_asyncio import client as async_client
+from kubernetes_asyncio.client.rest import ApiException
+
+from tcutils.kubernetes import api_client
+
+# api client settings which are carried over to the asyncio client
+CFG_ATTRS = ('host', 'api_key', 'api_key_prefix', 'refresh_api_key_hook',
+             'ssl_ca_cert', 'cert_file', 'key_file', 'verify_ssl',
+             'assert_hostname', 'connection_pool_maxsize')
+# number of custom resource objects created at a time
+CUSTOM_RESOURCE_CONCURRENCY = 10
+
+
+class Client(api_client.Client):
+    '''
+        Kubernetes API client which can also create objects concurrently
+        on an asyncio event loop, for bulk fixture setup. Ex :
+            asyncio.run(client.create_pods_bulk([{'name': 'pod1', ...},
+                                                 {'name': 'pod2', ...}]))
+        The model objects are built by the same helpers as the sync calls
+    '''
+    def __init__(self, *args, **kwargs):
+        super(Client, self).__init__(*args, **kwargs)
+        self._async_loop = None
+        self._async_api_client = None
+        self._async_semaphore = None
+    # end __init__
+
+    def _get_async_api_client(self):
+        '''
+        The aiohttp session of the client is bound to the running event
+        loop, so it is created on first use in each loop
+        '''
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            cfg = async_client.Configuration()
+            for attr in CFG_ATTRS:
+                setattr(cfg, attr, getattr(self.cfg, attr))
+            self._async_api_client = async_client.ApiClient(cfg)
+            if cfg.verify_ssl and cfg.assert_hostname is False:
+                self._skip_hostname_check(self._async_api_client)
+            self._async_semaphore = asyncio.Semaphore(
+                CUSTOM_RESOURCE_CONCURRENCY)
+            self._async_loop = loop
+        return self._async_api_client
+    # end _get_async_api_client
+
+    @staticmethod
+    def _skip_hostname_check(api):
+        '''
+        The asyncio client leaves assert_hostname out of its ssl context.
+        Give api a session which verifies the certificate, but not the
+        hostname, as the sync client does. It is called before any request,
+        so the session it replaces has no connections yet
+        '''
+        cfg = api.configuration
+        ssl_context = ssl.create_default_context(cafile=cfg.ssl_ca_cert)
+        if cfg.cert_file:
+            ssl_context.load_cert_chain(cfg.cert_file, keyfile=cfg.key_file)
+        ssl_context.check_hostname = False
+        rest_client = api.rest_client
+        asyncio.get_running_loop().create_task(rest_client.pool_manager.close())
+        rest_client.pool_manager = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=cfg.connection_pool_maxsize, ssl=ssl_context),
+            trust_env=True)
+    # end _skip_hostname_check
+
+    @property
+    def async_v1_h(self):
+        return async_client.CoreV1Api(self._get_async_api_client())
+
+    @property
+    def async_custom_h(self):
+        return async_client.CustomObjectsApi(self._get_async_api_client())
+
+    @property
+    def async_request_timeout(self):
+        # aiohttp takes only a total timeout
+        if isinstance(self.request_timeout, tuple):
+            return sum(self.request_timeout)
+        return self.request_timeout
+
+    async def close_async(self):
+        if self._async_api_client:
+            await self._async_api_client.close()
+            self._async_api_client = None
+            self._async_loop = None
+    # end close_async
+
+    async def create_pod_async(self,
+                               namespace='default',
+                               name=None,
+                               metadata=None,
+                               spec=None):
+        '''
+        Same as create_pod, to be awaited
+        return V1Pod instance
+        '''
+        body = self._get_pod(name, metadata, spec)
+        self.logger.info('Creating Pod %s', body.metadata.name)
+        return await self.async_v1_h.create_namespaced_pod(
+            namespace, body, _request_timeout=self.async_request_timeout)
+    # end create_pod_async
+
+    async def create_pods_bulk(self, pods):
+        '''
+        pods : list of dicts with the create_pod args of each pod
+        Creates all the pods concurrently, returns the list of V1Pod
+        '''
+        return await asyncio.gather(
+            *(self.create_pod_async(**pod) for pod in pods))
+    # end create_pods_bulk
+
+    async def create_custom_resource_object_async(
+            self,
+            namespace='default',
+            name=None, metadata=None,
+            spec=None,
+            apiVersion='k8s.cni.cncf.io/v1',
+            nad='NetworkAttachmentDefinition',
+            plural="network-attachment-definitions"):
+        '''
+        Same as create_custom_resource_object, to be awaited. At most
+        CUSTOM_RESOURCE_CONCURRENCY of them are sent at a time
+        Raises TransientK8sError or PermanentK8sError on failure
+        '''
+        group, version = apiVersion.split("/", 1)
+        body = self._get_custom_resource(namespace, name, metadata, spec,
+                                         apiVersion, nad)
+        custom_h = self.async_custom_h
+        async with self._async_semaphore:
+            try:
+                api_response = await custom_h.create_namespaced_custom_object(
+                    group, version, namespace, plural, body,
+                    _request_timeout=self.async_request_timeout)
+            except ApiException as e:
+                self.logger.exception("Exception calling %s",
+                                      "CustomObjectsApi->"
+                                      "create_namespaced_custom_object")
+                raise api_client._k8s_error(e) from e
+        self.logger.info('Creating NetworkAttachment %s:%s', namespace, name)
+        return api_response
+    # end create_custom_resource_object_async
+
+    async def create_custom_resource_objects_bulk(self, objects):
+        '''
+        objects : list of dicts with the create_custom_resource_object args
+                  of each object
+        Creates all the objects concurrently, returns the list of responses.
+        The first failure is raised
+        '''
+        return await asyncio.gather(
+            *(self.create_custom_resource_object_async(**obj)
+              for obj in objects))
+    # end create_custom_resource_objects_bulk
@@ -4,7 +4,7 @@ import time
 from common import log_orig as contrail_logging
 from tcutils.util import get_random_name, retry
 from tcutils.kubernetes import api_client
-from kubernetes import client, config
+from kubernetes import client
 from openshift.client.apis.oapi_api import OapiApi
 from openshift.dynamic import DynamicClient
 from openshift.client import ApiClient
@@ -69,9 +69,9 @@ class Client(api_client.Client):
     '''
     def __init__(self, config_file='/etc/kubernetes/admin.conf', logger=None):
         super(Client, self).__init__(config_file, logger)
-        #Creating Dynamic API client
-        k8s_client = config.new_client_from_config(config_file)
-        dyn_client = DynamicClient(k8s_client)
+        #Creating Dynamic API client, on the same ApiClient (and so the
+        #same connection pool) as the kubernetes api handles
+        dyn_client = DynamicClient(self.api_client)
         self.pod_h = dyn_client.resources.get(api_version='v1', kind='Pod')
         self.namespace_h = dyn_client.resources.get(api_version='v1', kind='Namespace')
         self.network_policy_h = dyn_client.resources.get(api_version='v1', kind='NetworkPolicy')
@@ -0,0 +1,157 @@
+"""Unittests for kubernetes api_client module.
+
+The generated kubernetes client is run for real, only the http requests
+are answered by a stub.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import urllib3
+from kubernetes import client
+
+from tcutils.kubernetes.api_client import Client, _NodeCache
+
+KUBE_CONFIG = """
+apiVersion: v1
+kind: Config
+clusters:
+- cluster: {server: "https://127.0.0.1:6443", insecure-skip-tls-verify: true}
+  name: test
+users:
+- name: test
+  user: {token: test}
+contexts:
+- context: {cluster: test, user: test}
+  name: test
+current-context: test
+"""
+
+STATUS_SUCCESS = {'kind': 'Status', 'apiVersion': 'v1', 'status': 'Success'}
+STATUS_NOT_FOUND = {'kind': 'Status', 'apiVersion': 'v1',
+                    'status': 'Failure', 'reason': 'NotFound', 'code': 404}
+
+
+class TestApiClient(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        fd, cls.config_file = tempfile.mkstemp(suffix='.yaml')
+        with os.fdopen(fd, 'w') as f:
+            f.write(KUBE_CONFIG)
+        cls.client = Client(config_file=cls.config_file, retries=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.config_file)
+
+    def stub_response(self, status, body):
+        '''Answer the http requests of self.client with status and the json
+        body, returns the mock of the request call
+        '''
+        response = urllib3.HTTPResponse(
+            body=json.dumps(body).encode(), status=status,
+            headers={'Content-Type': 'application/json'},
+            preload_content=True)
+        patcher = mock.patch.object(
+            self.client.api_client.rest_client.pool_manager, 'request',
+            return_value=response)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def assert_request(self, request, method, path):
+        args = request.call_args[0]
+        self.assertEqual(args[0], method)
+        self.assertEqual(urllib3.util.parse_url(args[1]).path, path)
+
+    def test_delete_daemonset(self):
+        request = self.stub_response(200, STATUS_SUCCESS)
+        resp = self.client.delete_daemonset('ds', namespace='ns')
+        self.assertEqual(resp.status, 'Success')
+        self.assert_request(request, 'DELETE',
+                            '/apis/apps/v1/namespaces/ns/daemonsets/ds')
+
+    def test_delete_daemonset_not_found(self):
+        self.stub_response(404, STATUS_NOT_FOUND)
+        self.assertIsNone(self.client.delete_daemonset('ds', namespace='ns'))
+
+    def test_delete_network_policy(self):
+        request = self.stub_response(200, STATUS_SUCCESS)
+        self.client.delete_network_policy('ns', 'np')
+        self.assert_request(
+            request, 'DELETE',
+            '/apis/networking.k8s.io/v1/namespaces/ns/networkpolicies/np')
+
+    def test_delete_service(self):
+        request = self.stub_response(200, STATUS_SUCCESS)
+        self.client.delete_service('ns', 'svc')
+        self.assert_request(request, 'DELETE',
+                            '/api/v1/namespaces/ns/services/svc')
+
+    def test_delete_secret(self):
+        request = self.stub_response(200, STATUS_SUCCESS)
+        self.client.delete_secret('ns', 'secret')
+        self.assert_request(request, 'DELETE',
+                            '/api/v1/namespaces/ns/secrets/secret')
+
+    def test_delete_custom_resource_object(self):
+        request = self.stub_response(200, STATUS_SUCCESS)
+        resp = self.client.delete_custom_resource_object('nad', namespace='ns')
+        self.assertEqual(resp['status'], 'Success')
+        self.assert_request(
+            request, 'DELETE',
+            '/apis/k8s.cni.cncf.io/v1/namespaces/ns/'
+            'network-attachment-definitions/nad')
+
+    def test_delete_custom_resource_object_not_found(self):
+        self.stub_response(404, STATUS_NOT_FOUND)
+        self.assertIsNone(
+            self.client.delete_custom_resource_object('nad', namespace='ns'))
+
+    def ingress(self, *backends):
+        paths = [client.V1HTTPIngressPath(backend=backend, path='/',
+                                          path_type='Prefix')
+                 for backend in backends]
+        return client.V1Ingress(spec=client.V1IngressSpec(rules=[
+            client.V1IngressRule(
+                http=client.V1HTTPIngressRuleValue(paths=paths))]))
+
+    def test_wa_ingress_named_service_port(self):
+        backend = client.V1IngressBackend(
+            service=client.V1IngressServiceBackend(
+                name='svc', port=client.V1ServiceBackendPort(name='http')))
+        self.client._wa_client_bug_18_for_ingress(self.ingress(backend))
+        self.assertEqual(backend.service_port, 'http')
+
+    def test_wa_ingress_resource_backend(self):
+        resource = client.V1IngressBackend(
+            resource=client.V1TypedLocalObjectReference(
+                api_group='k8s.example.com', kind='Bucket', name='static'))
+        service = client.V1IngressBackend(
+            service=client.V1IngressServiceBackend(
+                name='svc', port=client.V1ServiceBackendPort(number=80)))
+        self.client._wa_client_bug_18_for_ingress(
+            self.ingress(resource, service))
+        self.assertFalse(hasattr(resource, 'service_port'))
+        self.assertEqual(service.service_port, 80)
+
+    def test_node_cache_ignores_older_node(self):
+        def node(resource_version, label):
+            return client.V1Node(metadata=client.V1ObjectMeta(
+                name='node', resource_version=resource_version,
+                labels={'computenode': label}))
+        node_cache = _NodeCache(None, self.client.logger)
+        node_cache.update('MODIFIED', node('12', 'watched'))
+        # a patch response which arrives after a newer watch event
+        node_cache.update('MODIFIED', node('11', 'patched'))
+        self.assertEqual(
+            node_cache._nodes['node'].metadata.labels['computenode'], 'watched')
+        node_cache.update('MODIFIED', node('13', 'patched'))
+        self.assertEqual(
+            node_cache._nodes['node'].metadata.labels['computenode'], 'patched')
+
+if __name__ == '__main__':
+    unittest.main()